@@ -9,6 +9,16 @@ set -e
 # Default DPI setting (can be overridden)
 DPI=600
 
+# Optional chained steps (set via --unlock/--ocr/--page-numbers/--compress).
+# Chaining here instead of one subprocess per tool from the web app pays the
+# dependency checks and shell startup once per job.
+do_unlock=false
+do_ocr=false
+do_page_numbers=false
+do_compress=false
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 # Colors for output
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -35,6 +45,11 @@ show_help() {
     echo "  --pages all         # Convert all pages (safest)"
     echo "  --pages auto        # Auto-detect problem pages"
     echo "  --pages \"1 2 5\"     # Specific page numbers"
+    echo "  --inputs a.pdf b.pdf ...  # Batch mode: fix several PDFs in one run"
+    echo "  --unlock            # Remove security restrictions before fixing"
+    echo "  --ocr               # Run OCR on the fixed PDF"
+    echo "  --page-numbers      # Add page numbers to the fixed PDF"
+    echo "  --compress          # Compress the fixed PDF (ebook quality)"
     echo
     echo -e "${CYAN}WHAT IT DOES:${NC}"
     echo "• Scans PDF files for fonts with custom encodings that cause print problems"
@@ -540,6 +555,91 @@ fix_pdf_pages() {
     print_success "Fixed PDF created: $output_pdf"
 }
 
+# Run the optional chained steps on a fixed PDF, replacing it in place so
+# the final result keeps the caller's chosen output name
+run_post_steps() {
+    local pdf="$1"
+    local step_out
+
+    if [ "$do_ocr" = true ]; then
+        print_info "Post-step: running OCR..."
+        "$SCRIPT_DIR/additional-tools/ocr-and-index.sh" "$pdf" --full-ocr || true
+        step_out="${pdf%.pdf}-OCR.pdf"
+        if [ -f "$step_out" ]; then
+            mv "$step_out" "$pdf"
+        fi
+    fi
+
+    if [ "$do_page_numbers" = true ]; then
+        print_info "Post-step: adding page numbers..."
+        "$SCRIPT_DIR/additional-tools/add-page-numbers.sh" "$pdf" || true
+        step_out="${pdf%.pdf}-numbered.pdf"
+        if [ -f "$step_out" ]; then
+            mv "$step_out" "$pdf"
+        fi
+    fi
+
+    if [ "$do_compress" = true ]; then
+        print_info "Post-step: compressing..."
+        "$SCRIPT_DIR/additional-tools/compress-pdf.sh" "$pdf" ebook || true
+        step_out="${pdf%.pdf}-compressed.pdf"
+        if [ -f "$step_out" ]; then
+            mv "$step_out" "$pdf"
+        fi
+    fi
+}
+
+# Batch mode: fix several PDFs in one invocation (non-interactive).
+# Uses pages_mode/specified_pages from the caller's argument parsing.
+process_batch() {
+    local batch_pdfs=("$@")
+    local batch_total=${#batch_pdfs[@]}
+    local batch_num=1
+
+    print_info "Batch mode: processing $batch_total PDFs"
+    echo
+
+    for input_pdf in "${batch_pdfs[@]}"; do
+        if [ ! -f "$input_pdf" ]; then
+            print_error "[$batch_num/$batch_total] File not found: $input_pdf"
+            batch_num=$((batch_num + 1))
+            continue
+        fi
+
+        print_info "[$batch_num/$batch_total] Processing $(basename "$input_pdf")"
+
+        local total_pages=$(pdfinfo "$input_pdf" | grep "Pages:" | awk '{print $2}')
+        local problem_pages=""
+
+        case ${pages_mode:-all} in
+            all)
+                problem_pages=$(seq 1 $total_pages | tr '\n' ' ')
+                ;;
+            auto)
+                # scan_pdf_fonts narrates progress on stdout; the page list
+                # it reports is the last line of the capture
+                if problem_pages=$(scan_pdf_fonts "$input_pdf"); then
+                    problem_pages=$(printf '%s\n' "$problem_pages" | tail -n 1)
+                else
+                    print_success "No font problems in $(basename "$input_pdf") - skipping"
+                    batch_num=$((batch_num + 1))
+                    continue
+                fi
+                ;;
+            custom)
+                problem_pages="$specified_pages"
+                ;;
+        esac
+
+        fix_pdf_pages "$input_pdf" "$problem_pages" "${input_pdf%.pdf}-FIXED.pdf"
+        run_post_steps "${input_pdf%.pdf}-FIXED.pdf"
+        echo
+        batch_num=$((batch_num + 1))
+    done
+
+    print_success "Batch processing complete ($batch_total files)"
+}
+
 # Main function
 main() {
     # Handle command line arguments
@@ -549,6 +649,7 @@ main() {
 
     # Parse command line arguments
     local input_pdf=""
+    local input_pdfs=()
     local pages_mode=""
     local specified_pages=""
 
@@ -571,8 +672,31 @@ main() {
                 fi
                 shift 2
                 ;;
+            --inputs)
+                shift
+                while [[ $# -gt 0 && "$1" != --* ]]; do
+                    input_pdfs+=("$1")
+                    shift
+                done
+                ;;
+            --unlock)
+                do_unlock=true
+                shift
+                ;;
+            --ocr)
+                do_ocr=true
+                shift
+                ;;
+            --page-numbers)
+                do_page_numbers=true
+                shift
+                ;;
+            --compress)
+                do_compress=true
+                shift
+                ;;
             *.pdf)
-                input_pdf="$1"
+                input_pdfs+=("$1")
                 shift
                 ;;
             *)
@@ -583,10 +707,19 @@ main() {
     done
 
     print_header
-    
+
     # Check dependencies
     check_dependencies
 
+    # Batch mode: process every input in one run so dependency checks and
+    # tool startup are paid once for the whole set. Non-interactive.
+    if [ ${#input_pdfs[@]} -gt 1 ]; then
+        process_batch "${input_pdfs[@]}"
+        exit 0
+    fi
+
+    input_pdf="${input_pdfs[0]:-}"
+
     # Select PDF file
     print_info "Step 1: Select PDF file"
 
@@ -600,7 +733,18 @@ main() {
         print_error "File not found: $input_pdf"
         exit 1
     fi
-    
+
+    # Optional unlock step before fixing
+    local unlocked_pdf=""
+    if [ "$do_unlock" = true ]; then
+        print_info "Removing security restrictions..."
+        "$SCRIPT_DIR/additional-tools/unlock-pdf.sh" "$input_pdf" || true
+        if [ -f "${input_pdf%.pdf}-unlocked.pdf" ]; then
+            unlocked_pdf="${input_pdf%.pdf}-unlocked.pdf"
+            input_pdf="$unlocked_pdf"
+        fi
+    fi
+
     print_success "Selected: $(basename "$input_pdf")"
     echo
     print_info "DPI setting: ${DPI}"
@@ -693,7 +837,13 @@ main() {
     
     # Fix the PDF
     fix_pdf_pages "$input_pdf" "$problem_pages" "$output_pdf"
-    
+
+    # Drop the unlocked intermediate and run any chained post-steps
+    if [ -n "$unlocked_pdf" ]; then
+        rm -f "$unlocked_pdf"
+    fi
+    run_post_steps "$output_pdf"
+
     # Show results
     echo
     print_success "PDF processing completed!"
@@ -1,110 +1,331 @@
-from flask import Flask, request, render_template, send_file, jsonify
+from flask import Flask, request, render_template, send_file, jsonify, make_response
 import os
 import subprocess
 import tempfile
 import shutil
 from werkzeug.utils import secure_filename
+from urllib.parse import unquote
+
+from page_parallel import fix_pdf_parallel
+import mupdf_pipeline
 import uuid
 import time
+from pathlib import Path
+from functools import lru_cache
+import threading
+import json
+import sys
+
+# Celery is optional: without it (or without a broker) the app falls back to
+# processing uploads inline, which is fine for single-user deployments.
+try:
+    from celery import Celery
+except ImportError:
+    Celery = None
+
+# Optional: compresses HTML/JSON responses when installed
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+def _default_upload_folder():
+    """Pick a working folder for uploads and intermediates.
+
+    Every pipeline stage reads the previous stage's output back, so a
+    RAM-backed folder (tmpfs) turns that traffic into memory bandwidth
+    instead of disk I/O. Honors PDF_TMPDIR, prefers /dev/shm on Linux,
+    and falls back to a regular temp dir elsewhere.
+    """
+    base = os.environ.get('PDF_TMPDIR')
+    if not base and os.path.isdir('/dev/shm'):
+        base = '/dev/shm/pdf-solver'
+    if not base:
+        # Deterministic path, not mkdtemp(): every process (web workers,
+        # Celery workers) must resolve the same folder or downloads 404
+        base = os.path.join(tempfile.gettempdir(), 'pdf-solver')
+
+    # The parent (/dev/shm, /tmp) is world-writable, so the folder must stay
+    # private: create it 0700, tighten it if it already exists, and refuse
+    # one pre-created by another user who could then read or swap PDFs
+    try:
+        os.makedirs(base, mode=0o700)
+    except FileExistsError:
+        if os.stat(base).st_uid != os.getuid():
+            raise RuntimeError(f"Upload folder {base} is owned by another user")
+        os.chmod(base, 0o700)
+    return base
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
-app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
+app.config['UPLOAD_FOLDER'] = _default_upload_folder()
+
+if Compress is not None:
+    # Text responses only: PDFs are already compressed and are excluded by MIME
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json',
+                                        'text/javascript', 'text/css']
+    Compress(app)
 
-ALLOWED_EXTENSIONS = {'pdf'}
 CLEANUP_AGE = 86400  # Clean files older than 24 hours (in seconds)
 
+# Tool locations are fixed for the life of the process; resolve them once
+# at import instead of rebuilding dirname chains on every job
+BASE_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS = {
+    'unlock': str(BASE_DIR / 'additional-tools' / 'unlock-pdf.sh'),
+    'fix': str(BASE_DIR / 'fix-pdf-fonts-interactive.sh'),
+    'ocr': str(BASE_DIR / 'additional-tools' / 'ocr-and-index.sh'),
+    'pagenums': str(BASE_DIR / 'additional-tools' / 'add-page-numbers.sh'),
+    'compress': str(BASE_DIR / 'additional-tools' / 'compress-pdf.sh'),
+}
+GS_WORKER_SCRIPT = str(Path(__file__).resolve().parent / 'gs_worker.py')
+
+# SIMPLE_MODE=1 restores the original minimal behavior: process the upload
+# synchronously and return the finished result in the POST response, with no
+# queue, threads, or polling. Handy for single-user setups and testing.
+SIMPLE_MODE = os.environ.get('SIMPLE_MODE', '') == '1'
+
+# When set (e.g. '/_protected'), downloads are handed off to the reverse
+# proxy via X-Accel-Redirect so nginx streams the file with sendfile(2)
+# instead of tying up a Flask worker. See DEPLOYMENT.md for the nginx side.
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '')
+
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
+
+if Celery is not None:
+    celery = Celery('pdf', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+    # Route the CPU-heavy pipeline to a dedicated queue so OCR jobs don't
+    # starve lighter tasks. Workers: celery -A app worker -Q pdf --concurrency=N
+    celery.conf.task_routes = {'process_pdf': {'queue': 'pdf'}}
+    # The package being importable doesn't mean a broker is running: probe
+    # once at startup and fall back to local threads if nothing answers, so
+    # a standalone deployment isn't 500ing on every publish.
+    try:
+        _conn = celery.connection_for_write()
+        _conn.ensure_connection(max_retries=1, interval_start=0,
+                                interval_step=0, interval_max=0)
+        _conn.release()
+    except Exception:
+        celery = None
+else:
+    celery = None
+
+# Files belonging to each job, keyed by its download ID, so /cleanup can
+# delete them directly instead of scanning the whole upload folder. The
+# pipeline removes its own intermediates as it runs.
+JOBS = {}
+JOBS_LOCK = threading.Lock()
+
+def register_job_files(unique_id, *paths):
+    """Record files created for a job so /cleanup can remove them later"""
+    with JOBS_LOCK:
+        JOBS.setdefault(unique_id, []).extend(paths)
+
 def cleanup_old_files():
     """Remove files older than CLEANUP_AGE seconds"""
     try:
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            return
-
         now = time.time()
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            if os.path.isfile(filepath):
-                file_age = now - os.path.getmtime(filepath)
-                if file_age > CLEANUP_AGE:
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass  # Ignore errors (file might be in use)
-    except:
-        pass  # Ignore cleanup errors
+        # scandir's DirEntry caches type and mtime from the directory read,
+        # so this costs ~1 syscall per entry instead of 3
+        with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    if now - entry.stat().st_mtime > CLEANUP_AGE:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass  # Ignore errors (file might be in use)
+    except OSError:
+        pass  # Ignore cleanup errors (folder may not exist yet)
+
+CLEANUP_INTERVAL = 3600  # How often the background reaper sweeps (seconds)
+
+def _cleanup_reaper():
+    """Sweep the upload folder for expired files once an hour"""
+    while True:
+        time.sleep(CLEANUP_INTERVAL)
+        cleanup_old_files()
+        # Prune registry entries whose files are all gone: a client that
+        # closed the tab never POSTs /cleanup, and once the sweep above has
+        # aged the files out the entry would otherwise leak forever
+        with JOBS_LOCK:
+            for job_id in list(JOBS):
+                if not any(os.path.exists(path) for path in JOBS[job_id]):
+                    del JOBS[job_id]
+
+# Daemon thread: cleanup happens in the background instead of on requests
+threading.Thread(target=_cleanup_reaper, daemon=True).start()
 
 def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-@app.route('/')
-def index():
-    cleanup_old_files()  # Run cleanup on each request
-    return render_template('index.html')
-
-@app.route('/upload', methods=['POST'])
-def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
-
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
-
-    if file and allowed_file(file.filename):
-        # Generate unique filename to avoid conflicts
-        unique_id = str(uuid.uuid4())
-        filename = secure_filename(file.filename)
-        input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
-        file.save(input_path)
-
-        # Get parameters from form
-        email = request.form.get('email', '')
-        pages_mode = request.form.get('pages', 'all')
-        custom_pages = request.form.get('custom_pages', '')
-        dpi = request.form.get('dpi', '600')
-
-        # Get processing options
-        do_ocr = request.form.get('ocr', '') == '1'
-        add_page_numbers = request.form.get('page_numbers', '') == '1'
-        compress = request.form.get('compress', '') == '1'
-        remove_security = request.form.get('remove_security', '') == '1'
-
-        # Validate DPI
-        if dpi not in ['300', '600', '1200']:
-            dpi = '600'
-
-        # Process the PDF
+    # Only PDFs are accepted, so a single endswith beats rsplit + set lookup
+    return filename.lower().endswith('.pdf')
+
+# With GS_WORKER=1, compression jobs go to one resident gs_worker.py process
+# instead of a fresh shell per PDF, amortizing tool startup across jobs.
+GS_WORKER_ENABLED = os.environ.get('GS_WORKER', '') == '1'
+
+# With PDF_PARALLEL=1, whole-document font fixes rasterize page chunks on
+# all cores via page_parallel instead of the serial shell script.
+PDF_PARALLEL = os.environ.get('PDF_PARALLEL', '') == '1'
+
+# With PDF_PYMUPDF=1 (and pymupdf installed), the fix/page-number/compress
+# stages run in-process via MuPDF instead of shelling out per stage.
+PDF_PYMUPDF = os.environ.get('PDF_PYMUPDF', '') == '1' and mupdf_pipeline.available()
+_gs_worker = None
+_gs_worker_lock = threading.Lock()
+
+def _gs_compress(input_path, output_path, quality='ebook'):
+    """Send one compression job to the persistent Ghostscript worker.
+
+    The worker is started lazily and restarted if it has died. Returns True
+    when the worker reports success.
+    """
+    global _gs_worker
+    job = json.dumps({'input': input_path, 'output': output_path, 'quality': quality})
+
+    with _gs_worker_lock:
+        if _gs_worker is None or _gs_worker.poll() is not None:
+            _gs_worker = subprocess.Popen(
+                [sys.executable, GS_WORKER_SCRIPT],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True
+            )
         try:
-            output_filename = f"fixed_{filename}"
-            current_file = input_path
-
-            # Step 1: Remove security if requested (must be first)
-            if remove_security:
-                unlocked_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_unlocked.pdf")
-                unlock_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                           'additional-tools', 'unlock-pdf.sh')
-
-                result = subprocess.run(
-                    [unlock_script, current_file],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-
-                # Look for the unlocked file (script adds -unlocked suffix)
-                expected_unlocked = current_file.replace('.pdf', '-unlocked.pdf')
-                if os.path.exists(expected_unlocked):
-                    if current_file != input_path:
-                        os.remove(current_file)
-                    current_file = expected_unlocked
-
-            # Step 2: Fix PDF fonts (main processing)
-            fixed_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_fixed.pdf")
-            script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                     'fix-pdf-fonts-interactive.sh')
+            _gs_worker.stdin.write(job + '\n')
+            _gs_worker.stdin.flush()
+            reply = _gs_worker.stdout.readline()
+        except (BrokenPipeError, OSError):
+            return False
 
+    try:
+        return json.loads(reply).get('ok', False)
+    except ValueError:
+        return False
+
+def _suffixed(path, suffix):
+    """Derive the tool's output name for path, e.g. x.pdf -> x-FIXED.pdf.
+
+    Operates on the final path component only, unlike str.replace which
+    would also rewrite a '.pdf' occurring earlier in the path.
+    """
+    p = Path(path)
+    return str(p.with_name(f'{p.stem}{suffix}'))
+
+def _run_stage(cmd, current_file, intermediates, expected_suffix):
+    """Run one pipeline stage and hand its output to the next.
+
+    The tool scripts work on file paths and write their result next to the
+    input with a known suffix. Every file a stage produces is recorded in
+    intermediates; the caller unlinks them all once at the end instead of
+    stat/remove bookkeeping between stages. Returns the path the next
+    stage should consume.
+    """
+    # The scripts' output isn't consumed, so don't buffer it: piping it into
+    # Python would grow RAM with log volume and risks blocking the child
+    # once the pipe fills
+    subprocess.run(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    expected = _suffixed(current_file, expected_suffix)
+    if os.path.exists(expected):
+        intermediates.append(expected)
+        return expected
+    return current_file
+
+def _post_process(current_file, intermediates, options):
+    """Chain the optional OCR/page-numbers/compress stages on one file.
+
+    Only enabled stages run; each consumes the previous stage's output.
+    Stage outputs are recorded in intermediates for the caller's final
+    cleanup. Returns the path of the final file.
+    """
+    do_ocr = options.get('do_ocr', False)
+    add_page_numbers = options.get('add_page_numbers', False)
+    compress = options.get('compress', False)
+
+    stages = []
+    if do_ocr:
+        stages.append((SCRIPTS['ocr'], ['--full-ocr'], '-OCR.pdf'))
+    if add_page_numbers and not PDF_PYMUPDF:
+        stages.append((SCRIPTS['pagenums'], [], '-numbered.pdf'))
+    if compress and not (GS_WORKER_ENABLED or PDF_PYMUPDF):
+        stages.append((SCRIPTS['compress'], ['ebook'], '-compressed.pdf'))
+
+    for stage_script, extra_args, suffix in stages:
+        cmd = [stage_script, current_file] + extra_args
+        current_file = _run_stage(cmd, current_file, intermediates, suffix)
+
+    if add_page_numbers and PDF_PYMUPDF:
+        # Page numbering in-process via MuPDF
+        numbered = _suffixed(current_file, '-numbered.pdf')
+        if mupdf_pipeline.add_page_numbers(current_file, numbered):
+            intermediates.append(numbered)
+            current_file = numbered
+
+    if compress and PDF_PYMUPDF:
+        # Compression in-process via MuPDF
+        compressed = _suffixed(current_file, '-compressed.pdf')
+        if mupdf_pipeline.compress(current_file, compressed):
+            intermediates.append(compressed)
+            current_file = compressed
+    elif compress and GS_WORKER_ENABLED:
+        # Compression via the resident Ghostscript worker
+        compressed = _suffixed(current_file, '-compressed.pdf')
+        if _gs_compress(current_file, compressed) and os.path.exists(compressed):
+            intermediates.append(compressed)
+            current_file = compressed
+        else:
+            # Worker unavailable (gs missing, process died): run the shell
+            # compress stage rather than silently skipping the requested step
+            current_file = _run_stage([SCRIPTS['compress'], current_file, 'ebook'],
+                                      current_file, intermediates, '-compressed.pdf')
+
+    return current_file
+
+def process_pdf(unique_id, input_path, filename, options):
+    """Run the unlock -> fix -> OCR -> page-numbers -> compress pipeline.
+
+    Runs inside a Celery worker when a broker is configured, or inline in
+    the request as a fallback. Returns a dict suitable for jsonify().
+    """
+    pages_mode = options.get('pages_mode', 'all')
+    custom_pages = options.get('custom_pages', '')
+    dpi = options.get('dpi', '600')
+    do_ocr = options.get('do_ocr', False)
+    add_page_numbers = options.get('add_page_numbers', False)
+    compress = options.get('compress', False)
+    remove_security = options.get('remove_security', False)
+
+    intermediates = []
+    try:
+        output_filename = f"fixed_{filename}"
+        current_file = input_path
+
+        # Step 1: Remove security if requested (must be first)
+        if remove_security:
+            current_file = _run_stage([SCRIPTS['unlock'], current_file],
+                                      current_file, intermediates, '-unlocked.pdf')
+
+        # Step 2: Fix PDF fonts (main processing)
+        fixed_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_fixed.pdf")
+
+        # Whole-document conversions can run in-process via PyMuPDF, or
+        # rasterize page chunks in parallel on all cores; either way the
+        # shell script remains the fallback
+        if PDF_PYMUPDF and pages_mode != 'custom' and mupdf_pipeline.fix_fonts(current_file, fixed_path, dpi):
+            intermediates.append(fixed_path)
+            current_file = fixed_path
+        elif PDF_PARALLEL and pages_mode != 'custom' and fix_pdf_parallel(current_file, fixed_path, dpi):
+            intermediates.append(fixed_path)
+            current_file = fixed_path
+        else:
             # Build command with parameters
-            cmd = [script_path, current_file, '--dpi', dpi]
+            cmd = [SCRIPTS['fix'], current_file, '--dpi', dpi]
 
             # Add page selection
             if pages_mode == 'custom' and custom_pages:
@@ -113,125 +334,395 @@ def upload_file():
             else:
                 cmd.extend(['--pages', pages_mode])
 
-            # Run the script with auto-confirmation
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                text=True
-            )
+            # Run the script with auto-confirmation. stderr goes to a spooled
+            # buffer that stays in memory below 256 KB and spills to a temp
+            # file beyond that, so verbose runs can't balloon the worker's RAM
+            with tempfile.SpooledTemporaryFile(max_size=256 * 1024) as stderr_log:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.DEVNULL,
+                    stderr=stderr_log,
+                    stdin=subprocess.PIPE,
+                    text=True
+                )
 
-            stdout, stderr = process.communicate(input=f"y\n{fixed_path}\ny\n")
+                process.communicate(input=f"y\n{fixed_path}\ny\n")
 
-            if process.returncode != 0:
-                # Clean up
-                if current_file != input_path:
-                    os.remove(current_file)
-                os.remove(input_path)
-                return jsonify({'error': f'PDF processing failed: {stderr}'}), 500
+                if process.returncode != 0:
+                    stderr_log.seek(0)
+                    stderr = stderr_log.read().decode('utf-8', 'replace')
+                    return {'error': f'PDF processing failed: {stderr}'}
 
             # Find the output file (script adds -FIXED suffix)
-            auto_output = current_file.replace('.pdf', '-FIXED.pdf')
+            auto_output = _suffixed(current_file, '-FIXED.pdf')
             if os.path.exists(auto_output):
-                if current_file != input_path:
-                    os.remove(current_file)
+                intermediates.append(auto_output)
                 current_file = auto_output
             elif os.path.exists(fixed_path):
-                if current_file != input_path:
-                    os.remove(current_file)
+                intermediates.append(fixed_path)
                 current_file = fixed_path
             else:
-                if current_file != input_path:
-                    os.remove(current_file)
-                os.remove(input_path)
-                return jsonify({'error': 'Output file was not created'}), 500
-
-            # Step 3: OCR if requested
-            if do_ocr:
-                ocr_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_ocr.pdf")
-                ocr_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                        'additional-tools', 'ocr-and-index.sh')
-
-                result = subprocess.run(
-                    [ocr_script, current_file, '--full-ocr'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+                return {'error': 'Output file was not created'}
 
-                # Look for OCR output (script adds -OCR suffix)
-                expected_ocr = current_file.replace('.pdf', '-OCR.pdf')
-                if os.path.exists(expected_ocr):
-                    os.remove(current_file)
-                    current_file = expected_ocr
-
-            # Step 4: Add page numbers if requested
-            if add_page_numbers:
-                numbered_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_numbered.pdf")
-                pagenums_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                             'additional-tools', 'add-page-numbers.sh')
-
-                result = subprocess.run(
-                    [pagenums_script, current_file],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+        # Steps 3-5: chain the optional post-processing stages
+        current_file = _post_process(current_file, intermediates, options)
 
-                # Look for numbered output (script adds -numbered suffix)
-                expected_numbered = current_file.replace('.pdf', '-numbered.pdf')
-                if os.path.exists(expected_numbered):
-                    os.remove(current_file)
-                    current_file = expected_numbered
-
-            # Step 5: Compress if requested (should be last)
-            if compress:
-                compress_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                             'additional-tools', 'compress-pdf.sh')
-
-                result = subprocess.run(
-                    [compress_script, current_file, 'ebook'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
+        # Final output path
+        output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{output_filename}")
+        shutil.move(current_file, output_path)
 
-                # Look for compressed output (script adds -compressed suffix)
-                expected_compressed = current_file.replace('.pdf', '-compressed.pdf')
-                if os.path.exists(expected_compressed):
-                    os.remove(current_file)
-                    current_file = expected_compressed
+        # Store the file paths for download
+        return {
+            'success': True,
+            'download_id': unique_id,
+            'filename': output_filename,
+            'email': options.get('email', '')  # Store for future email notification feature
+        }
 
-            # Final output path
+    except Exception as e:
+        return {'error': str(e)}
+    finally:
+        # One sweep removes the input and every intermediate, on success or
+        # error alike; the moved final output is simply no longer there
+        Path(input_path).unlink(missing_ok=True)
+        for path in intermediates:
+            Path(path).unlink(missing_ok=True)
+
+def process_pdf_batch(unique_id, input_paths, filenames, options):
+    """Fix several PDFs with a single tool invocation.
+
+    The fix script runs once with --inputs for the whole batch, so
+    dependency checks and tool startup are paid once rather than per file.
+    Optional post-processing still runs per file.
+    """
+    pages_mode = options.get('pages_mode', 'all')
+    custom_pages = options.get('custom_pages', '')
+    dpi = options.get('dpi', '600')
+    remove_security = options.get('remove_security', False)
+
+    intermediates = []
+    try:
+        # Unlock runs per file before the batched fix
+        current_files = []
+        for input_path in input_paths:
+            current_file = input_path
+            if remove_security:
+                current_file = _run_stage([SCRIPTS['unlock'], current_file],
+                                          current_file, intermediates, '-unlocked.pdf')
+            current_files.append(current_file)
+
+        cmd = [SCRIPTS['fix'], '--dpi', dpi]
+        if pages_mode == 'custom' and custom_pages:
+            cmd.extend(['--pages', custom_pages.replace(',', ' ')])
+        else:
+            cmd.extend(['--pages', pages_mode])
+        cmd.append('--inputs')
+        cmd.extend(current_files)
+
+        # Batch output is judged by which -FIXED files appear, not by logs
+        subprocess.run(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        files = []
+        # Outputs are mapped back by position: the indexed input paths keep
+        # same-named files distinct all the way to the download names
+        for i, (input_path, current_file, filename) in enumerate(
+                zip(input_paths, current_files, filenames)):
+            fixed = _suffixed(current_file, '-FIXED.pdf')
+            if not os.path.exists(fixed):
+                files.append({'filename': filename, 'error': 'Output file was not created'})
+                continue
+            intermediates.append(fixed)
+
+            final = _post_process(fixed, intermediates, options)
+
+            output_filename = f"fixed_{i}_{filename}"
             output_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{output_filename}")
-            shutil.move(current_file, output_path)
+            shutil.move(final, output_path)
+            files.append({'filename': output_filename, 'success': True})
+
+        return {
+            'success': True,
+            'download_id': unique_id,
+            'files': files
+        }
+    except Exception as e:
+        return {'error': str(e)}
+    finally:
+        for path in input_paths:
+            Path(path).unlink(missing_ok=True)
+        for path in intermediates:
+            Path(path).unlink(missing_ok=True)
+
+if celery is not None:
+    process_pdf = celery.task(process_pdf, name='process_pdf')
+    process_pdf_batch = celery.task(process_pdf_batch, name='process_pdf_batch')
+
+# Fallback job tracking when no Celery broker is available. Jobs still run
+# off the request thread so /upload returns immediately in either mode.
+# Finished entries are evicted after a TTL so the dict stays bounded.
+local_jobs = {}
+LOCAL_JOBS_LOCK = threading.Lock()
+LOCAL_JOB_TTL = 3600  # Keep finished jobs pollable for an hour
+
+def _evict_local_jobs():
+    """Drop finished local jobs past their TTL. Caller holds LOCAL_JOBS_LOCK."""
+    now = time.time()
+    for job_id in list(local_jobs):
+        if now - local_jobs[job_id].get('done_at', now) > LOCAL_JOB_TTL:
+            del local_jobs[job_id]
+
+def _start_local_job(job_id):
+    """Register a new local job, evicting expired ones while we're here"""
+    with LOCAL_JOBS_LOCK:
+        _evict_local_jobs()
+        local_jobs[job_id] = {'state': 'STARTED'}
+
+def _run_local_job(job_id, task_func, *args):
+    # Always record a terminal state: if the task escapes with an exception
+    # the job would otherwise sit at STARTED and the client polls forever
+    try:
+        result = task_func(*args)
+    except Exception as e:
+        result = {'error': str(e)}
+    state = 'FAILURE' if 'error' in result else 'SUCCESS'
+    with LOCAL_JOBS_LOCK:
+        local_jobs[job_id] = dict(result, state=state, done_at=time.time())
+
+# index.html has no per-request variables, so the rendered page is cached
+# after the first hit; POST /reload drops the cache if the template changes
+@lru_cache(maxsize=1)
+def _rendered_index():
+    return render_template('index.html')
+
+@app.route('/')
+def index():
+    return _rendered_index()
 
-            # Clean up input file
-            if os.path.exists(input_path):
-                os.remove(input_path)
+@app.route('/reload', methods=['POST'])
+def reload_index():
+    """Drop the cached landing page after a template change"""
+    _rendered_index.cache_clear()
+    return jsonify({'success': True})
 
-            # Store the file paths for download
+def parse_options(get):
+    """Build the pipeline options dict from a form/JSON get() callable"""
+    dpi = get('dpi', '600')
+
+    # Validate DPI
+    if dpi not in ['300', '600', '1200']:
+        dpi = '600'
+
+    return {
+        'email': get('email', ''),
+        'pages_mode': get('pages', 'all'),
+        'custom_pages': get('custom_pages', ''),
+        'dpi': dpi,
+        'do_ocr': get('ocr', '') == '1',
+        'add_page_numbers': get('page_numbers', '') == '1',
+        'compress': get('compress', '') == '1',
+        'remove_security': get('remove_security', '') == '1',
+    }
+
+def dispatch_job(unique_id, input_path, filename, options):
+    """Queue a processing job (Celery if configured, local thread otherwise)"""
+    register_job_files(
+        unique_id,
+        input_path,
+        os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_fixed_{filename}")
+    )
+
+    if SIMPLE_MODE:
+        # Block the request and hand back the completed job directly
+        result = process_pdf(unique_id, input_path, filename, options)
+        if 'error' in result:
+            return jsonify(result), 500
+        return jsonify(result)
+
+    if celery is not None:
+        # Queue the job and return immediately; the frontend polls /status
+        try:
+            task = process_pdf.delay(unique_id, input_path, filename, options)
+        except Exception:
+            pass  # Broker went away after startup; use the local path below
+        else:
             return jsonify({
                 'success': True,
-                'download_id': unique_id,
-                'filename': output_filename,
-                'email': email  # Store for future email notification feature
+                'job_id': task.id,
+                'filename': f"fixed_{filename}"
             })
 
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(input_path):
-                os.remove(input_path)
-            return jsonify({'error': str(e)}), 500
+    # No broker available: process in a background thread instead
+    _start_local_job(unique_id)
+    thread = threading.Thread(
+        target=_run_local_job,
+        args=(unique_id, process_pdf, unique_id, input_path, filename, options),
+        daemon=True
+    )
+    thread.start()
+    return jsonify({
+        'success': True,
+        'job_id': unique_id,
+        'filename': f"fixed_{filename}"
+    })
+
+def dispatch_batch_job(unique_id, input_paths, filenames, options):
+    """Queue a multi-file processing job"""
+    for i, (input_path, filename) in enumerate(zip(input_paths, filenames)):
+        register_job_files(
+            unique_id,
+            input_path,
+            os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_fixed_{i}_{filename}")
+        )
+
+    if SIMPLE_MODE:
+        # Block the request and hand back the completed batch directly,
+        # matching the single-file path: synchronous clients never poll
+        result = process_pdf_batch(unique_id, input_paths, filenames, options)
+        if 'error' in result:
+            return jsonify(result), 500
+        return jsonify(result)
+
+    if celery is not None:
+        try:
+            task = process_pdf_batch.delay(unique_id, input_paths, filenames, options)
+        except Exception:
+            pass  # Broker went away after startup; use the local path below
+        else:
+            return jsonify({'success': True, 'job_id': task.id})
+
+    _start_local_job(unique_id)
+    thread = threading.Thread(
+        target=_run_local_job,
+        args=(unique_id, process_pdf_batch, unique_id, input_paths, filenames, options),
+        daemon=True
+    )
+    thread.start()
+    return jsonify({'success': True, 'job_id': unique_id})
+
+@app.route('/upload', methods=['POST'])
+def upload_file():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+
+    files = [f for f in request.files.getlist('file') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'No file selected'}), 400
+
+    # Several PDFs in one request: fix them all with a single tool invocation
+    if len(files) > 1:
+        if not all(allowed_file(f.filename) for f in files):
+            return jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400
+
+        unique_id = uuid.uuid4().hex
+        input_paths = []
+        filenames = []
+        # Index every path: two uploads may share a basename (or both reduce
+        # to 'document.pdf' after sanitizing), and a name-keyed path would
+        # silently overwrite the first file with the second
+        for i, f in enumerate(files):
+            filename = secure_filename(f.filename) or 'document.pdf'
+            input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{i}_{filename}")
+            f.save(input_path)
+            input_paths.append(input_path)
+            filenames.append(filename)
+
+        options = parse_options(request.form.get)
+        return dispatch_batch_job(unique_id, input_paths, filenames, options)
+
+    file = files[0]
+
+    if file and allowed_file(file.filename):
+        # Generate unique filename to avoid conflicts
+        unique_id = uuid.uuid4().hex
+        filename = secure_filename(file.filename)
+        input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
+        file.save(input_path)
+
+        options = parse_options(request.form.get)
+        return dispatch_job(unique_id, input_path, filename, options)
 
     return jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400
 
+@app.route('/upload_raw', methods=['POST'])
+def upload_raw():
+    """Streaming upload: raw PDF bytes in the body, metadata in headers.
+
+    Bypasses Werkzeug's multipart parser entirely, so memory use stays at
+    one copy buffer regardless of how large the PDF is.
+    """
+    # The frontend URI-encodes the filename to keep the header ASCII-safe
+    raw_name = unquote(request.headers.get('X-Filename', ''))
+    if not raw_name:
+        return jsonify({'error': 'No file provided'}), 400
+
+    if not allowed_file(raw_name):
+        return jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400
+
+    try:
+        header_options = json.loads(request.headers.get('X-Options', '{}'))
+        if not isinstance(header_options, dict):
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': 'Invalid X-Options header'}), 400
+
+    unique_id = uuid.uuid4().hex
+    filename = secure_filename(raw_name)
+    if not filename:
+        filename = 'document.pdf'
+    input_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{unique_id}_{filename}")
+
+    # Stream the body straight to disk in 1 MB chunks
+    with open(input_path, 'wb') as f:
+        shutil.copyfileobj(request.stream, f, length=1 << 20)
+
+    if os.path.getsize(input_path) == 0:
+        os.remove(input_path)
+        return jsonify({'error': 'File is empty'}), 400
+
+    options = parse_options(header_options.get)
+    return dispatch_job(unique_id, input_path, filename, options)
+
+@app.route('/status/<job_id>')
+def job_status(job_id):
+    """Poll the state of a queued processing job"""
+    # Local jobs exist when no broker is configured, and also when a Celery
+    # publish failed and the job was rerouted to a thread
+    job = local_jobs.get(job_id)
+    if job is not None:
+        return jsonify(job)
+    if celery is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    async_result = celery.AsyncResult(job_id)
+    response = {'state': async_result.state}
+
+    if async_result.state == 'SUCCESS':
+        result = async_result.result
+        if isinstance(result, dict):
+            response.update(result)
+        if 'error' in response:
+            response['state'] = 'FAILURE'
+    elif async_result.state == 'FAILURE':
+        response['error'] = str(async_result.result)
+
+    return jsonify(response)
+
 @app.route('/download/<download_id>/<filename>')
 def download_file(download_id, filename):
     try:
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{download_id}_{filename}")
         if os.path.exists(file_path):
+            if X_ACCEL_PREFIX:
+                # Let the reverse proxy stream the bytes from disk
+                response = make_response('')
+                response.headers['X-Accel-Redirect'] = f"{X_ACCEL_PREFIX}/{download_id}_{filename}"
+                response.headers['Content-Type'] = 'application/pdf'
+                response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
             return send_file(file_path, as_attachment=True, download_name=filename)
         else:
             return jsonify({'error': 'File not found'}), 404
@@ -243,16 +734,17 @@ def cleanup():
     """Clean up processed files after download"""
     data = request.get_json()
     download_id = data.get('download_id')
-    
+
     if download_id:
-        # Remove all files with this download_id
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            if filename.startswith(download_id):
-                try:
-                    os.remove(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                except:
-                    pass
-    
+        # Remove just this job's files; no directory scan needed
+        with JOBS_LOCK:
+            paths = JOBS.pop(download_id, [])
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
     return jsonify({'success': True})
 
 if __name__ == '__main__':
@@ -265,4 +757,4 @@ if __name__ == '__main__':
     debug = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
 
     # Run the app
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    app.run(host=host, port=port, debug=debug)
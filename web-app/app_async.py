@@ -1,4 +1,4 @@
-from flask import Flask, request, render_template, send_file, jsonify
+from flask import Flask, request, render_template, send_file, jsonify, make_response
 import os
 import subprocess
 import tempfile
@@ -6,13 +6,29 @@ import shutil
 from werkzeug.utils import secure_filename
 import uuid
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
+from collections import OrderedDict, deque
 import time
 import re
 
+# Celery + Redis are optional: with a broker configured, jobs fan out across
+# worker processes and job state is shared through Redis, so the app scales
+# past one process (gunicorn -w N / celery worker pools). Without them the
+# original threaded, in-process mode still works.
+try:
+    from celery import Celery
+except ImportError:
+    Celery = None
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
 app.config['UPLOAD_FOLDER'] = '/tmp/pdf-uploads'
@@ -31,19 +47,140 @@ def add_security_headers(response):
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Resolved once at import: the traversal checks compare against this prefix on
+# every request. The trailing separator also stops a sibling directory like
+# /tmp/pdf-uploads-evil from passing a plain startswith test.
+UPLOAD_FOLDER_ABS = os.path.abspath(app.config['UPLOAD_FOLDER'])
+_UPLOAD_PREFIX = UPLOAD_FOLDER_ABS + os.sep
+
+# When set (e.g. /_protected), downloads are answered with an
+# X-Accel-Redirect header and nginx streams the file itself; see
+# DEPLOYMENT.md for the matching internal location block
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '')
+
+# Tool script location, resolved once at import. The fix script chains the
+# unlock/OCR/page-number/compress tools internally via its flags.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_FIX_SCRIPT = os.path.join(_REPO_ROOT, 'fix-pdf-fonts-interactive.sh')
+
 ALLOWED_EXTENSIONS = {'pdf'}
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 MAX_FILENAME_LENGTH = 255
 CLEANUP_AGE = 86400  # Clean files older than 24 hours (in seconds)
 
-# Store processing jobs in memory (in production, use Redis or database)
-processing_jobs = {}
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 
-# Rate limiting: track uploads per IP
+if Celery is not None:
+    celery = Celery('pdf_async', broker=CELERY_BROKER_URL)
+    # Having the celery package installed is not the same as having a broker
+    # running: probe once at startup and drop to the threaded path if nothing
+    # is listening, instead of 500ing every upload when publish raises.
+    try:
+        _conn = celery.connection_for_write()
+        _conn.ensure_connection(max_retries=1, interval_start=0,
+                                interval_step=0, interval_max=0)
+        _conn.release()
+    except Exception:
+        celery = None
+else:
+    celery = None
+
+# Job state lives in Redis when available so status/download work from any
+# worker process; the in-memory dict remains for single-process setups.
+REDIS_URL = os.environ.get('REDIS_URL', CELERY_BROKER_URL if celery is not None else '')
+if redis is not None and REDIS_URL.startswith('redis://'):
+    _redis = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    try:
+        _redis.ping()
+    except (redis.RedisError, OSError):
+        _redis = None  # Package installed but no server behind the URL
+else:
+    _redis = None
+
+# Celery workers are separate processes, so job state must flow through
+# Redis; with a broker but no usable Redis, the worker would write into its
+# own in-memory dict while /status reads this process's, leaving every job
+# stuck at 'queued'. Run locally instead.
+if celery is not None and _redis is None:
+    celery = None
+
+# Bounded worker pool for the non-Celery path (and the safety net if the
+# broker disappears after startup): PDF processing is CPU/IO heavy, and
+# capping concurrency keeps a burst of uploads queued rather than thrashing
+# the machine with one unbounded thread per upload
+_executor = None
+_executor_lock = threading.Lock()
+
+def _local_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4,
+                                           thread_name_prefix='pdfproc')
+        return _executor
+
+# Insertion-ordered so eviction can stop at the first entry young enough to
+# keep. Redis entries expire on their own; this bounds the in-memory fallback.
+processing_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_FAILED_JOB_AGE = 3600  # Keep failed jobs' errors visible for an hour
+
+def _evict_expired():
+    """Drop finished jobs clients can no longer use. Caller holds _jobs_lock.
+
+    Completed jobs expire with their files (CLEANUP_AGE); failed jobs keep
+    their error readable for _FAILED_JOB_AGE. Jobs are in creation order, so
+    the scan bails out at the first one inside the retention window.
+    """
+    now = time.time()
+    for job_id, job in list(processing_jobs.items()):
+        try:
+            age = now - datetime.fromisoformat(job.get('created_at', '')).timestamp()
+        except ValueError:
+            continue
+        if age <= _FAILED_JOB_AGE:
+            break
+        status = job.get('status')
+        if status == 'failed' or (status == 'completed' and age > CLEANUP_AGE):
+            del processing_jobs[job_id]
+
+def job_set(job_id, **fields):
+    """Update job state fields in the shared store"""
+    if _redis is not None:
+        try:
+            _redis.hset(f'job:{job_id}', mapping=fields)
+            _redis.expire(f'job:{job_id}', CLEANUP_AGE)
+            return
+        except (redis.RedisError, OSError):
+            pass  # Redis went away mid-flight; keep state in memory
+    with _jobs_lock:
+        if job_id not in processing_jobs:
+            # Amortize eviction over inserts so the table stays bounded
+            # without a dedicated sweeper
+            _evict_expired()
+        processing_jobs.setdefault(job_id, {}).update(fields)
+
+def job_get(job_id):
+    """Fetch job state, or None if the job is unknown"""
+    if _redis is not None:
+        try:
+            data = _redis.hgetall(f'job:{job_id}')
+            if data:
+                return data
+        except (redis.RedisError, OSError):
+            pass  # Fall back to the in-memory store
+    with _jobs_lock:
+        job = processing_jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+# Rate limiting: token bucket per IP, stored as (tokens, last_refill)
 upload_attempts = {}
+_rl_lock = threading.Lock()
 MAX_UPLOADS_PER_IP = 5
 RATE_LIMIT_WINDOW = 3600  # 1 hour
 
+_CLEANUP_INTERVAL = 300  # Seconds between cleanup sweeps
+
 def cleanup_old_files():
     """Remove files older than CLEANUP_AGE seconds"""
     try:
@@ -51,31 +188,50 @@ def cleanup_old_files():
             return
 
         now = time.time()
-        for filename in os.listdir(app.config['UPLOAD_FOLDER']):
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            if os.path.isfile(filepath):
-                file_age = now - os.path.getmtime(filepath)
-                if file_age > CLEANUP_AGE:
-                    try:
-                        os.remove(filepath)
-                    except:
-                        pass  # Ignore errors (file might be in use)
+        # scandir yields cached stat results from the directory scan itself,
+        # avoiding a separate stat() syscall per file
+        with os.scandir(app.config['UPLOAD_FOLDER']) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and now - entry.stat().st_mtime > CLEANUP_AGE:
+                        os.remove(entry.path)
+                except OSError:
+                    pass  # Ignore errors (file might be in use)
     except:
         pass  # Ignore cleanup errors
 
+def _periodic_cleanup():
+    """Sweep the upload folder on a timer, fully off the request path"""
+    cleanup_old_files()
+    timer = threading.Timer(_CLEANUP_INTERVAL, _periodic_cleanup)
+    timer.daemon = True
+    timer.start()
+
+# Start the cleanup timer once per serving process. Under the werkzeug
+# reloader only the child (WERKZEUG_RUN_MAIN=true) serves requests, so skip
+# the parent to avoid a duplicate timer.
+if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    _periodic_cleanup()
+
+# RFC 5322 simplified regex, compiled once instead of per validation
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_EMAIL_DANGEROUS = frozenset('<>\\/|;&$`')
+
+# Job IDs are str(uuid.uuid4()); a regex match is a fraction of the cost of
+# constructing (and raising from) a uuid.UUID on every poll, and /status is
+# hit every few seconds per active job
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
 def validate_email(email):
     """Validate email format to prevent injection"""
     if not email or len(email) > 254:  # Max email length
         return False
 
-    # RFC 5322 simplified regex
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(pattern, email):
+    if not _EMAIL_RE.match(email):
         return False
 
     # Additional security: block common malicious patterns
-    dangerous_chars = ['<', '>', '\\', '/', '|', ';', '&', '$', '`']
-    if any(char in email for char in dangerous_chars):
+    if not _EMAIL_DANGEROUS.isdisjoint(email):
         return False
 
     return True
@@ -89,26 +245,62 @@ def allowed_file(filename):
     return ext in ALLOWED_EXTENSIONS
 
 def check_rate_limit(ip_address):
-    """Simple rate limiting per IP"""
+    """Token-bucket rate limiting per IP.
+
+    Each IP gets a bucket of MAX_UPLOADS_PER_IP tokens refilled over
+    RATE_LIMIT_WINDOW seconds. Checking costs O(1) regardless of how many
+    IPs have been seen, unlike the old per-request sweep that rebuilt a
+    timestamp list for every tracked address.
+    """
     current_time = time.time()
+    refill_rate = MAX_UPLOADS_PER_IP / RATE_LIMIT_WINDOW
 
-    # Clean old entries
-    for ip in list(upload_attempts.keys()):
-        upload_attempts[ip] = [t for t in upload_attempts[ip]
-                              if current_time - t < RATE_LIMIT_WINDOW]
-        if not upload_attempts[ip]:
-            del upload_attempts[ip]
+    with _rl_lock:
+        tokens, last_refill = upload_attempts.get(ip_address, (MAX_UPLOADS_PER_IP, current_time))
+        tokens = min(MAX_UPLOADS_PER_IP, tokens + (current_time - last_refill) * refill_rate)
 
-    # Check current IP
-    if ip_address not in upload_attempts:
-        upload_attempts[ip_address] = []
+        if tokens < 1:
+            upload_attempts[ip_address] = (tokens, current_time)
+            return False
 
-    if len(upload_attempts[ip_address]) >= MAX_UPLOADS_PER_IP:
-        return False
+        upload_attempts[ip_address] = (tokens - 1, current_time)
+
+        # Lazy eviction: only when the table has grown, drop IPs whose buckets
+        # have fully refilled (i.e. idle for at least a whole window)
+        if len(upload_attempts) > 1024:
+            for ip in list(upload_attempts):
+                t, last = upload_attempts[ip]
+                if t + (current_time - last) * refill_rate >= MAX_UPLOADS_PER_IP:
+                    del upload_attempts[ip]
 
-    upload_attempts[ip_address].append(current_time)
     return True
 
+# Persistent SMTP connection: opening a fresh TCP connection and replaying
+# the EHLO handshake for every notification is wasted round-trips when
+# Postfix is happy to keep the session open
+_smtp_conn = None
+_smtp_lock = threading.Lock()
+
+def _smtp_connection():
+    """Return a live SMTP connection to local Postfix, reconnecting as needed.
+
+    Caller must hold _smtp_lock (SMTP sessions are not thread-safe).
+    """
+    global _smtp_conn
+    if _smtp_conn is not None:
+        try:
+            _smtp_conn.noop()
+            return _smtp_conn
+        except (smtplib.SMTPException, OSError):
+            try:
+                _smtp_conn.close()
+            except Exception:
+                pass
+            _smtp_conn = None
+
+    _smtp_conn = smtplib.SMTP('localhost', 25)
+    return _smtp_conn
+
 def send_email(to_email, subject, body):
     """Send email via local Postfix"""
     try:
@@ -119,49 +311,68 @@ def send_email(to_email, subject, body):
 
         msg.attach(MIMEText(body, 'html'))
 
-        # Connect to local Postfix
-        with smtplib.SMTP('localhost', 25) as server:
-            server.send_message(msg)
+        with _smtp_lock:
+            try:
+                _smtp_connection().send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Postfix dropped the idle session between NOOP and send
+                global _smtp_conn
+                _smtp_conn = None
+                _smtp_connection().send_message(msg)
 
         return True
     except Exception as e:
         print(f"Email error: {e}")
         return False
 
+# The fix script colors its terminal output; strip escape codes before
+# showing lines to the browser
+_ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+def _suffixed(path, tag):
+    """Append a tool's tag before the extension: doc.pdf -> doc-FIXED.pdf.
+
+    str.replace('.pdf', ...) rewrites every occurrence, so a name like
+    report.pdf.pdf or an upload with '.pdf' mid-name got mangled;
+    os.path.splitext only ever touches the real extension.
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}{tag}{ext}"
+
+def _advance_stage(current_file, expected, input_path):
+    """Adopt a stage's output file if the tool produced it.
+
+    EAFP: one stat() on the expected output instead of an exists() check
+    followed by a second filesystem lookup when the file is then removed or
+    renamed. Returns the file the pipeline should continue from.
+    """
+    try:
+        os.stat(expected)
+    except FileNotFoundError:
+        return current_file
+
+    if current_file != input_path:
+        try:
+            os.remove(current_file)
+        except FileNotFoundError:
+            pass
+    return expected
+
 def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom_pages, dpi,
                       do_ocr, add_page_numbers, compress, remove_security, request_host):
-    """Process PDF in background thread"""
+    """Process PDF in a background thread or Celery worker"""
     try:
-        processing_jobs[job_id]['status'] = 'processing'
-        processing_jobs[job_id]['progress'] = 'Processing your PDF...'
+        job_set(job_id, status='processing', progress='Processing your PDF...')
 
         current_file = input_path
 
-        # Step 1: Remove security if requested
-        if remove_security:
-            processing_jobs[job_id]['progress'] = 'Removing security restrictions...'
-            unlock_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                       'additional-tools', 'unlock-pdf.sh')
-
-            result = subprocess.run(
-                [unlock_script, current_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            expected_unlocked = current_file.replace('.pdf', '-unlocked.pdf')
-            if os.path.exists(expected_unlocked):
-                if current_file != input_path:
-                    os.remove(current_file)
-                current_file = expected_unlocked
-
-        # Step 2: Fix PDF fonts (main processing)
-        processing_jobs[job_id]['progress'] = 'Converting PDF pages to high-resolution images...'
-        script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                 'fix-pdf-fonts-interactive.sh')
-
-        cmd = [script_path, current_file, '--dpi', dpi]
+        # One script invocation covers the whole job: unlock, font fix, and
+        # the optional post-steps all chain inside fix-pdf-fonts-interactive.sh,
+        # so dependency checks and per-tool shell startup are paid once instead
+        # of once per stage
+        job_set(job_id, progress='Converting PDF pages to high-resolution images...')
+
+        cmd = [_FIX_SCRIPT, current_file, '--dpi', dpi]
 
         if pages_mode == 'custom' and custom_pages:
             pages = custom_pages.replace(',', ' ')
@@ -169,20 +380,61 @@ def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom
         else:
             cmd.extend(['--pages', pages_mode])
 
+        if remove_security:
+            cmd.append('--unlock')
+        if do_ocr:
+            cmd.append('--ocr')
+        if add_page_numbers:
+            cmd.append('--page-numbers')
+        if compress:
+            cmd.append('--compress')
+
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             stdin=subprocess.PIPE,
-            text=True
+            text=True,
+            bufsize=1  # line buffered so progress arrives as it happens
         )
 
-        stdout, stderr = process.communicate(input=f"y\n{output_path}\ny\n")
+        def _relay_progress(stream):
+            # Stream stdout line by line: memory stays O(1) instead of
+            # buffering the whole transcript, and the latest line becomes
+            # the live progress message the /status poller sees
+            for line in stream:
+                line = _ANSI_RE.sub('', line).strip()
+                if line:
+                    job_set(job_id, progress=line)
+            stream.close()
+
+        # Keep only a short stderr tail for error reporting
+        stderr_tail = deque(maxlen=20)
+
+        def _collect_stderr(stream):
+            for line in stream:
+                stderr_tail.append(line)
+            stream.close()
+
+        readers = [threading.Thread(target=_relay_progress, args=(process.stdout,), daemon=True),
+                   threading.Thread(target=_collect_stderr, args=(process.stderr,), daemon=True)]
+        for reader in readers:
+            reader.start()
+
+        try:
+            process.stdin.write(f"y\n{output_path}\ny\n")
+            process.stdin.close()
+        except BrokenPipeError:
+            pass  # Script exited before reading its prompts
+
+        process.wait()
+        for reader in readers:
+            reader.join()
 
         if process.returncode != 0:
-            processing_jobs[job_id]['status'] = 'failed'
+            stderr = ''.join(stderr_tail).strip()
             error_msg = stderr if stderr else f"Script exited with code {process.returncode}. Check logs for details."
-            processing_jobs[job_id]['error'] = error_msg
+            job_set(job_id, status='failed', error=error_msg)
 
             if email:
                 send_email(email, 'PDF Processing Failed',
@@ -193,81 +445,22 @@ def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom
                     </body></html>''')
             return
 
-        # Find the output file
-        auto_output = current_file.replace('.pdf', '-FIXED.pdf')
-        if os.path.exists(auto_output):
-            if current_file != input_path:
-                os.remove(current_file)
-            current_file = auto_output
-        elif os.path.exists(output_path):
-            if current_file != input_path:
-                os.remove(current_file)
-            current_file = output_path
-        else:
-            processing_jobs[job_id]['status'] = 'failed'
-            processing_jobs[job_id]['error'] = 'Output file was not created'
+        # Find the output file (the script runs post-steps in place, so this
+        # is the finished PDF)
+        auto_output = _suffixed(current_file, '-FIXED')
+        next_file = _advance_stage(current_file, auto_output, input_path)
+        if next_file == current_file:
+            next_file = _advance_stage(current_file, output_path, input_path)
+        if next_file == current_file:
+            job_set(job_id, status='failed', error='Output file was not created')
             return
-
-        # Step 3: OCR if requested
-        if do_ocr:
-            processing_jobs[job_id]['progress'] = 'Running OCR...'
-            ocr_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                    'additional-tools', 'ocr-and-index.sh')
-
-            result = subprocess.run(
-                [ocr_script, current_file, '--full-ocr'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            expected_ocr = current_file.replace('.pdf', '-OCR.pdf')
-            if os.path.exists(expected_ocr):
-                os.remove(current_file)
-                current_file = expected_ocr
-
-        # Step 4: Add page numbers if requested
-        if add_page_numbers:
-            processing_jobs[job_id]['progress'] = 'Adding page numbers...'
-            pagenums_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                         'additional-tools', 'add-page-numbers.sh')
-
-            result = subprocess.run(
-                [pagenums_script, current_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            expected_numbered = current_file.replace('.pdf', '-numbered.pdf')
-            if os.path.exists(expected_numbered):
-                os.remove(current_file)
-                current_file = expected_numbered
-
-        # Step 5: Compress if requested
-        if compress:
-            processing_jobs[job_id]['progress'] = 'Compressing PDF...'
-            compress_script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-                                         'additional-tools', 'compress-pdf.sh')
-
-            result = subprocess.run(
-                [compress_script, current_file, 'ebook'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-
-            expected_compressed = current_file.replace('.pdf', '-compressed.pdf')
-            if os.path.exists(expected_compressed):
-                os.remove(current_file)
-                current_file = expected_compressed
+        current_file = next_file
 
         # Move to final output path
         shutil.move(current_file, output_path)
 
         # Mark as completed
-        processing_jobs[job_id]['status'] = 'completed'
-        processing_jobs[job_id]['completed_at'] = datetime.now().isoformat()
+        job_set(job_id, status='completed', completed_at=datetime.now().isoformat())
 
         # Send success email if provided
         if email:
@@ -278,7 +471,7 @@ def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom
                 <p>Your PDF has been successfully processed and is ready for download.</p>
                 <p><a href="{download_url}" style="display:inline-block;padding:10px 20px;background-color:#3498db;color:white;text-decoration:none;border-radius:5px;">Download Fixed PDF</a></p>
                 <p>This link will be available for 24 hours.</p>
-                <p><small>File: {processing_jobs[job_id]['filename']}</small></p>
+                <p><small>File: {(job_get(job_id) or {}).get('filename', '')}</small></p>
                 </body></html>''')
 
     except Exception as e:
@@ -286,8 +479,7 @@ def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom
         error_details = traceback.format_exc()
         print(f"ERROR in process_pdf_async for job {job_id}: {error_details}", flush=True)
 
-        processing_jobs[job_id]['status'] = 'failed'
-        processing_jobs[job_id]['error'] = str(e)
+        job_set(job_id, status='failed', error=str(e))
 
         if email:
             send_email(email, 'PDF Processing Failed',
@@ -300,9 +492,11 @@ def process_pdf_async(job_id, input_path, output_path, email, pages_mode, custom
         if os.path.exists(input_path):
             os.remove(input_path)
 
+if celery is not None:
+    process_pdf_async = celery.task(process_pdf_async, name='process_pdf_async')
+
 @app.route('/')
 def index():
-    cleanup_old_files()  # Run cleanup on each request
     return render_template('index_async.html')
 
 @app.route('/upload', methods=['POST'])
@@ -316,17 +510,24 @@ def upload_file():
     if not check_rate_limit(client_ip):
         return jsonify({'error': 'Too many upload attempts. Please try again later.'}), 429
 
+    # Resolve the request proxies once: request.form and request.files parse
+    # the multipart body on first access and every attribute lookup goes
+    # through werkzeug's context-local indirection
+    form = request.form
+    files = request.files
+    host = request.host
+
     # Get parameters from form
-    email = request.form.get('email', '').strip()
-    pages_mode = request.form.get('pages', 'all')
-    custom_pages = request.form.get('custom_pages', '')
-    dpi = request.form.get('dpi', '600')
+    email = form.get('email', '').strip()
+    pages_mode = form.get('pages', 'all')
+    custom_pages = form.get('custom_pages', '')
+    dpi = form.get('dpi', '600')
 
     # Get processing options
-    do_ocr = request.form.get('ocr', '') == '1'
-    add_page_numbers = request.form.get('page_numbers', '') == '1'
-    compress = request.form.get('compress', '') == '1'
-    remove_security = request.form.get('remove_security', '') == '1'
+    do_ocr = form.get('ocr', '') == '1'
+    add_page_numbers = form.get('page_numbers', '') == '1'
+    compress = form.get('compress', '') == '1'
+    remove_security = form.get('remove_security', '') == '1'
 
     # Validate DPI
     if dpi not in ['300', '600', '1200']:
@@ -336,25 +537,19 @@ def upload_file():
     if email and not validate_email(email):
         return jsonify({'error': 'Invalid email address format'}), 400
 
-    if 'file' not in request.files:
+    if 'file' not in files:
         return jsonify({'error': 'No file provided'}), 400
 
-    file = request.files['file']
+    file = files['file']
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
     if file and allowed_file(file.filename):
-        # Validate file size (double check since MAX_CONTENT_LENGTH should catch this)
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-
-        if file_size > MAX_FILE_SIZE:
+        # Validate file size from the request header instead of seeking through
+        # the spooled upload (MAX_CONTENT_LENGTH already rejects larger bodies)
+        if request.content_length and request.content_length > MAX_FILE_SIZE:
             return jsonify({'error': 'File size exceeds 100MB limit'}), 400
 
-        if file_size == 0:
-            return jsonify({'error': 'File is empty'}), 400
-
         # Sanitize filename and validate length
         original_filename = file.filename
         if len(original_filename) > MAX_FILENAME_LENGTH:
@@ -373,34 +568,54 @@ def upload_file():
             filename += '.pdf'
 
         # Build paths - ensure they're within UPLOAD_FOLDER (prevent path traversal)
-        input_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_{filename}"))
-        output_path = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], f"{job_id}_fixed_{filename}"))
+        input_path = os.path.abspath(os.path.join(UPLOAD_FOLDER_ABS, f"{job_id}_{filename}"))
+        output_path = os.path.abspath(os.path.join(UPLOAD_FOLDER_ABS, f"{job_id}_fixed_{filename}"))
 
         # Security check: ensure paths are within UPLOAD_FOLDER
-        if not input_path.startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
+        if not input_path.startswith(_UPLOAD_PREFIX):
             return jsonify({'error': 'Invalid file path'}), 400
-        if not output_path.startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
+        if not output_path.startswith(_UPLOAD_PREFIX):
             return jsonify({'error': 'Invalid file path'}), 400
 
-        file.save(input_path)
+        # Stream to disk in 4MB chunks: fewer write syscalls than file.save's
+        # default buffer, and no extra pass over the data to measure it
+        with open(input_path, 'wb') as out:
+            shutil.copyfileobj(file.stream, out, length=4 * 1024 * 1024)
+
+        if os.path.getsize(input_path) == 0:
+            os.remove(input_path)
+            return jsonify({'error': 'File is empty'}), 400
+
+        # Reject non-PDF content up front: the extension check only looks at
+        # the name, and queueing a mislabeled file wastes a worker slot on a
+        # pipeline that is guaranteed to fail
+        with open(input_path, 'rb') as check:
+            if check.read(5) != b'%PDF-':
+                os.remove(input_path)
+                return jsonify({'error': 'File is not a valid PDF'}), 400
 
         # Create job entry
-        processing_jobs[job_id] = {
-            'filename': f"fixed_{filename}",
-            'email': email,
-            'status': 'queued',
-            'created_at': datetime.now().isoformat(),
-            'output_path': output_path
-        }
-
-        # Start background processing
-        thread = threading.Thread(
-            target=process_pdf_async,
-            args=(job_id, input_path, output_path, email, pages_mode, custom_pages, dpi,
-                  do_ocr, add_page_numbers, compress, remove_security, request.host)
-        )
-        thread.daemon = True
-        thread.start()
+        job_set(job_id,
+                filename=f"fixed_{filename}",
+                email=email,
+                status='queued',
+                created_at=datetime.now().isoformat(),
+                output_path=output_path)
+
+        # Start background processing: hand off to a Celery worker when a
+        # broker is available, otherwise queue on the bounded local pool.
+        # Status is already 'queued', so polling works while the job waits.
+        job_args = (job_id, input_path, output_path, email, pages_mode, custom_pages, dpi,
+                    do_ocr, add_page_numbers, compress, remove_security, host)
+        dispatched = False
+        if celery is not None:
+            try:
+                process_pdf_async.delay(*job_args)
+                dispatched = True
+            except Exception as e:
+                print(f"Celery dispatch failed ({e}); running job locally", flush=True)
+        if not dispatched:
+            _local_executor().submit(process_pdf_async, *job_args)
 
         # Return job info for status polling
         return jsonify({
@@ -417,15 +632,13 @@ def upload_file():
 def job_status(job_id):
     """Check job status"""
     # Validate job_id is a UUID
-    try:
-        uuid.UUID(job_id)
-    except ValueError:
+    if not _UUID_RE.match(job_id):
         return jsonify({'error': 'Invalid job ID'}), 400
 
-    if job_id not in processing_jobs:
+    job = job_get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
 
-    job = processing_jobs[job_id]
     response = {
         'status': job['status'],
         'filename': job.get('filename'),
@@ -443,28 +656,34 @@ def job_status(job_id):
 def download_file(job_id):
     """Download completed PDF"""
     # Validate job_id is a UUID
-    try:
-        uuid.UUID(job_id)
-    except ValueError:
+    if not _UUID_RE.match(job_id):
         return jsonify({'error': 'Invalid job ID'}), 400
 
-    if job_id not in processing_jobs:
+    job = job_get(job_id)
+    if job is None:
         return jsonify({'error': 'Job not found'}), 404
 
-    job = processing_jobs[job_id]
-
     if job['status'] != 'completed':
         return jsonify({'error': f"Job status: {job['status']}"}), 400
 
     output_path = job['output_path']
 
     # Security: verify the path is still within UPLOAD_FOLDER
-    if not os.path.abspath(output_path).startswith(os.path.abspath(app.config['UPLOAD_FOLDER'])):
+    if not os.path.abspath(output_path).startswith(_UPLOAD_PREFIX):
         return jsonify({'error': 'Invalid file path'}), 403
 
     if not os.path.exists(output_path):
         return jsonify({'error': 'File not found'}), 404
 
+    if X_ACCEL_PREFIX:
+        # Hand the transfer to nginx: it streams the file with sendfile()
+        # while this worker is immediately free for the next request
+        response = make_response('')
+        response.headers['X-Accel-Redirect'] = f"{X_ACCEL_PREFIX}/{os.path.basename(output_path)}"
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'attachment; filename="{job["filename"]}"'
+        return response
+
     return send_file(
         output_path,
         as_attachment=True,
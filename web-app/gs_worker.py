@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Long-lived Ghostscript compression worker.
+
+Reads one JSON job per line on stdin ({"input": ..., "output": ...,
+"quality": ...}) and replies with one JSON result per line on stdout.
+Keeping this process resident lets the web app compress many PDFs without
+paying shell startup and dependency checks on every document; app.py
+launches it on demand when GS_WORKER=1 is set.
+"""
+
+import json
+import shutil
+import subprocess
+import sys
+
+QUALITIES = {'screen', 'ebook', 'printer', 'prepress'}
+
+
+def run_gs(job):
+    """Run one Ghostscript compression job, returning a result dict"""
+    input_path = job.get('input')
+    output_path = job.get('output')
+    quality = job.get('quality', 'ebook')
+
+    if not input_path or not output_path:
+        return {'ok': False, 'error': 'Missing input/output path'}
+    if quality not in QUALITIES:
+        quality = 'ebook'
+
+    result = subprocess.run(
+        ['gs', '-sDEVICE=pdfwrite',
+         '-dCompatibilityLevel=1.4',
+         f'-dPDFSETTINGS=/{quality}',
+         '-dNOPAUSE', '-dQUIET', '-dBATCH',
+         f'-sOutputFile={output_path}',
+         input_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+
+    if result.returncode != 0:
+        return {'ok': False, 'error': result.stderr.strip()}
+    return {'ok': True, 'output': output_path}
+
+
+def main():
+    if shutil.which('gs') is None:
+        print(json.dumps({'ok': False, 'error': 'Ghostscript not installed'}),
+              flush=True)
+        sys.exit(1)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            print(json.dumps({'ok': False, 'error': 'Invalid job'}), flush=True)
+            continue
+        try:
+            result = run_gs(job)
+        except Exception as e:
+            result = {'ok': False, 'error': str(e)}
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""In-process PDF stages backed by PyMuPDF.
+
+Doing the work inside the worker process skips fork/exec and tool startup
+for each stage and keeps pages in memory instead of round-tripping whole
+PDFs through the upload folder. PyMuPDF is optional: app.py only uses these
+when PDF_PYMUPDF=1 and the import succeeds, and the shell-script pipeline
+remains the fallback for every stage.
+"""
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+
+def available():
+    """True when PyMuPDF is importable"""
+    return fitz is not None
+
+
+def fix_fonts(input_path, output_path, dpi='600'):
+    """Rasterize every page to an image, fixing font-encoding print problems.
+
+    Same effect as the shell pipeline (render at high DPI, rebuild the PDF
+    from images) without subprocesses or intermediate files.
+    """
+    if fitz is None:
+        return False
+
+    try:
+        src = fitz.open(input_path)
+        out = fitz.open()
+        for page in src:
+            pix = page.get_pixmap(dpi=int(dpi))
+            new_page = out.new_page(width=page.rect.width, height=page.rect.height)
+            new_page.insert_image(new_page.rect, stream=pix.tobytes('png'))
+        out.save(output_path)
+        out.close()
+        src.close()
+    except Exception:
+        return False
+    return True
+
+
+def add_page_numbers(input_path, output_path):
+    """Stamp a centered page number at the bottom of every page"""
+    if fitz is None:
+        return False
+
+    try:
+        doc = fitz.open(input_path)
+        for number, page in enumerate(doc, start=1):
+            text = str(number)
+            x = page.rect.width / 2 - 4 * len(text)
+            y = page.rect.height - 20
+            page.insert_text((x, y), text, fontsize=10)
+        doc.save(output_path)
+        doc.close()
+    except Exception:
+        return False
+    return True
+
+
+def compress(input_path, output_path):
+    """Rewrite the PDF with garbage collection and deflate compression"""
+    if fitz is None:
+        return False
+
+    try:
+        doc = fitz.open(input_path)
+        doc.save(output_path, garbage=4, deflate=True, clean=True)
+        doc.close()
+    except Exception:
+        return False
+    return True